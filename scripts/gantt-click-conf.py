@@ -1,17 +1,98 @@
 import os
 import sys
 import json
-import requests
-import matplotlib.pyplot as plt
+import logging
+import functools
+import hashlib
+import re
+import asyncio
+import base64
+import aiohttp
+import backoff
 import matplotlib.dates as mdates
-from datetime import datetime, timedelta
+import numpy as np
+import orjson
+from matplotlib.collections import PolyCollection
+from matplotlib.figure import Figure
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 import io
 
 load_dotenv()
 
+log = logging.getLogger(__name__)
+
+# Conexiones simultáneas máximas por host (límite de rate de cada API)
+CLICKUP_MAX_CONNECTIONS = 10
+CONFLUENCE_MAX_CONNECTIONS = 10
+
+# Proyectos que se sincronizan a la vez
+MAX_CONCURRENT_PROJECTS = 8
+
+# Reintentos y timeout por petición contra las APIs
+MAX_RETRIES = 3
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=20)
+# Tiempo total de reintentos: los MAX_RETRIES timeouts más las esperas
+MAX_RETRY_TIME = MAX_RETRIES * REQUEST_TIMEOUT.total + 10
+
+# Caché en disco de las respuestas de ClickUp (ETag + JSON por lista)
+CLICKUP_CACHE_DIR = os.getenv("CLICKUP_CACHE_DIR", os.path.join(".cache", "clickup"))
+
+# Variables de entorno que definen un proyecto (con sufijo numérico opcional)
+PROJECT_VAR_PATTERN = re.compile(
+    r"^(CLICKUP_LIST_ID|CLICKUP_FOLDER_ID|CONFLUENCE_PAGE_ID)(?:_([1-9]\d*))?$"
+)
+
+
+# Colores estilo ClickUp según el status de la tarea
+STATUS_COLORS = {
+    "ACHIEVED": "#8dd879",
+    "COMPLETE": "#8dd879",
+    "COMPLETED": "#8dd879",
+    "APPROVED": "#8dd879",
+    "FINALIZED": "#8dd879",
+    "DONE": "#8dd879",
+    "CLOSED": "#8dd879",
+    "MONITORING": "#a8c5f0",
+    "IMPLEMENTING": "#a8c5f0",
+    "PROGRESS": "#a8c5f0",
+    "REVIEWING": "#a8c5f0",
+    "IN PROGRESS": "#a8c5f0",
+    "TODO": "#e0e0e0",
+    "TO DO": "#e0e0e0",
+    "OPEN": "#e0e0e0",
+    "DRAFTING": "#e0e0e0",
+    "NOT STARTED": "#e0e0e0",
+}
+DEFAULT_STATUS_COLOR = "#e0e0e0"  # Gris claro por defecto
+
+# Tamaño del Gantt: alto por tarea y tope por imagen (en pulgadas); si hay
+# más tareas de las que caben, se reparten en varias imágenes
+ROW_HEIGHT = 0.3
+MAX_FIGURE_HEIGHT = 36
+MAX_TASKS_PER_IMAGE = round(MAX_FIGURE_HEIGHT / ROW_HEIGHT)  # 120 tareas
+
+# Un día en milisegundos (unidad de los timestamps de ClickUp)
+DAY_MS = 24 * 60 * 60 * 1000
+
+# Búsqueda exacta y, como respaldo, por palabra clave contenida en el status
+STATUS_LUT = {key.upper(): color for key, color in STATUS_COLORS.items()}
+
 
 # --- Funciones auxiliares ---
+@functools.lru_cache(maxsize=1)
+def _read_config_file(config_file, mtime):
+    """
+    Lee y parsea el archivo de configuración.
+
+    `mtime` solo forma parte de la clave de caché: si el archivo se edita,
+    cambia su fecha de modificación y se vuelve a leer.
+    """
+    with open(config_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
 def load_config(config_file="config.json"):
     """Carga configuración desde archivo JSON o variables de entorno."""
     print(f"[INFO] Cargando configuración desde {config_file}...")
@@ -19,8 +100,7 @@ def load_config(config_file="config.json"):
     # Intentar cargar desde archivo JSON
     if os.path.exists(config_file):
         try:
-            with open(config_file, "r", encoding="utf-8") as f:
-                config = json.load(f)
+            config = _read_config_file(config_file, os.path.getmtime(config_file))
             print(f"[OK] Configuración cargada desde {config_file}")
             return config
         except Exception as e:
@@ -30,47 +110,48 @@ def load_config(config_file="config.json"):
     # Fallback: usar variables de entorno (compatibilidad con versión anterior)
     print("[INFO] Archivo config.json no encontrado, usando variables de entorno...")
 
+    # Copia local del entorno: evita una llamada a os.getenv por cada variable
+    env = dict(os.environ)
+
     config = {
         "confluence": {
-            "url": os.getenv("CONFLUENCE_URL"),
-            "user": os.getenv("CONFLUENCE_USER"),
-            "api_token": os.getenv("CONFLUENCE_API_TOKEN"),
+            "url": env.get("CONFLUENCE_URL"),
+            "user": env.get("CONFLUENCE_USER"),
+            "api_token": env.get("CONFLUENCE_API_TOKEN"),
         },
-        "clickup": {"api_token": os.getenv("CLICKUP_API_TOKEN")},
+        "clickup": {"api_token": env.get("CLICKUP_API_TOKEN")},
         "mappings": [],
     }
 
+    # Agrupar las variables de proyecto por índice en una sola pasada.
+    # Las variables sin sufijo equivalen al proyecto 1 (la de sufijo _1 manda).
+    projects = defaultdict(dict)
+    for key, value in env.items():
+        match = PROJECT_VAR_PATTERN.match(key)
+        if not match or not value:
+            continue
+        variable, suffix = match.groups()
+        if suffix:
+            projects[int(suffix)][variable] = value
+        else:
+            projects[1].setdefault(variable, value)
+
     # Buscar múltiples proyectos (numerados desde 1)
-    index = 1
-    while True:
-        # Buscar variables con sufijo numérico
-        list_id = (
-            os.getenv(f"CLICKUP_LIST_ID_{index}")
-            if index > 1
-            else os.getenv("CLICKUP_LIST_ID_1") or os.getenv("CLICKUP_LIST_ID")
-        )
-        folder_id = (
-            os.getenv(f"CLICKUP_FOLDER_ID_{index}")
-            if index > 1
-            else os.getenv("CLICKUP_FOLDER_ID_1") or os.getenv("CLICKUP_FOLDER_ID")
-        )
-        page_id = (
-            os.getenv(f"CONFLUENCE_PAGE_ID_{index}")
-            if index > 1
-            else os.getenv("CONFLUENCE_PAGE_ID_1") or os.getenv("CONFLUENCE_PAGE_ID")
-        )
-        name = os.getenv(f"PROJECT_NAME_{index}", f"Proyecto {index}")
+    for index in sorted(projects):
+        list_id = projects[index].get("CLICKUP_LIST_ID")
+        folder_id = projects[index].get("CLICKUP_FOLDER_ID")
+        page_id = projects[index].get("CONFLUENCE_PAGE_ID")
+        name = env.get(f"PROJECT_NAME_{index}", f"Proyecto {index}")
 
-        # Si no hay más IDs, terminar búsqueda
+        # Sin lista ni carpeta no hay nada que sincronizar
         if not list_id and not folder_id:
-            break
+            continue
 
         # Validar que tenga página asociada
         if not page_id:
             print(
                 f"[WARNING] Proyecto {index} no tiene CONFLUENCE_PAGE_ID_{index}, saltando..."
             )
-            index += 1
             continue
 
         # Crear mapping
@@ -86,7 +167,6 @@ def load_config(config_file="config.json"):
             print(f"[INFO] Proyecto {index}: Usando CLICKUP_LIST_ID_{index} (lista)")
 
         config["mappings"].append(mapping)
-        index += 1
 
     # Validar que las credenciales básicas existan
     if not all(
@@ -115,113 +195,233 @@ def load_config(config_file="config.json"):
     return config
 
 
-def get_lists_from_folder(api_token, folder_id):
+def basic_auth_header(confluence_config):
+    """Construye el header Authorization (Basic) para Confluence."""
+    credentials = f"{confluence_config['user']}:{confluence_config['api_token']}"
+    return "Basic " + base64.b64encode(credentials.encode("utf-8")).decode("ascii")
+
+
+def _is_permanent_error(exception):
+    """Los errores 4xx no se arreglan reintentando (salvo 429, rate limit)."""
+    return (
+        isinstance(exception, aiohttp.ClientResponseError)
+        and 400 <= exception.status < 500
+        and exception.status != 429
+    )
+
+
+def _log_retry(details):
+    error = details["exception"]
+    print(
+        f"[WARNING] Intento {details['tries']}/{MAX_RETRIES} fallido "
+        f"({type(error).__name__}: {error}), reintentando en {details['wait']:.1f}s"
+    )
+
+
+# Política de reintentos común: backoff exponencial (1s, 2s...) con jitter
+_retry = backoff.on_exception(
+    backoff.expo,
+    (asyncio.TimeoutError, aiohttp.ClientConnectionError, aiohttp.ClientResponseError),
+    max_tries=MAX_RETRIES,
+    max_time=MAX_RETRY_TIME,
+    max_value=30,
+    jitter=backoff.full_jitter,
+    giveup=_is_permanent_error,
+    on_backoff=_log_retry,
+    logger=None,
+)
+
+
+async def _request_once(session, method, url, **kwargs):
+    """
+    Petición HTTP de un solo intento.
+
+    Devuelve el JSON de la respuesta, o None si no tiene cuerpo.
+    """
+    kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+    async with session.request(method, url, **kwargs) as response:
+        response.raise_for_status()
+        if response.status == 204:
+            return None
+        return orjson.loads(await response.read())
+
+
+@_retry
+async def _request(session, method, url, **kwargs):
+    """
+    Petición HTTP con reintentos (backoff exponencial con jitter).
+
+    Solo para peticiones que se pueden repetir tal cual (GET, DELETE). Un
+    POST multipart no se puede reenviar porque su cuerpo ya se consumió, y
+    el PUT de la página lleva el número de versión siguiente: si el primer
+    intento se aplicó pero no llegó la respuesta, el reintento da 409.
+    """
+    return await _request_once(session, method, url, **kwargs)
+
+
+@_retry
+async def _conditional_get(session, url, etag=None, **kwargs):
+    """
+    GET condicional con reintentos: envía If-None-Match si hay ETag.
+
+    Devuelve (status, etag, cuerpo); en un 304 el cuerpo viene vacío.
+    """
+    headers = {"If-None-Match": etag} if etag else {}
+    async with session.get(
+        url, headers=headers, timeout=REQUEST_TIMEOUT, **kwargs
+    ) as response:
+        response.raise_for_status()
+        return response.status, response.headers.get("ETag"), await response.read()
+
+
+def _cache_path(list_id):
+    """Archivo de caché de la lista: ETag en la primera línea y luego el JSON."""
+    return os.path.join(CLICKUP_CACHE_DIR, f"{list_id}.cache")
+
+
+def _load_cached_tasks(list_id):
+    """Devuelve (etag, cuerpo) guardados para la lista, o (None, None)."""
+    try:
+        with open(_cache_path(list_id), "rb") as f:
+            etag, _, body = f.read().partition(b"\n")
+    except OSError:
+        return None, None
+    if not etag:
+        return None, None
+    return etag.decode("utf-8", "replace"), body
+
+
+def _store_cached_tasks(list_id, etag, body):
+    """
+    Guarda la respuesta de la lista junto a su ETag (el caché es opcional).
+
+    Se escribe en un archivo temporal y se renombra: si el proceso muere a
+    mitad, queda la entrada anterior completa y nunca un JSON truncado.
+    """
+    path = _cache_path(list_id)
+    try:
+        os.makedirs(CLICKUP_CACHE_DIR, exist_ok=True)
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(etag.encode("utf-8") + b"\n")
+            f.write(body)
+        os.replace(f"{path}.tmp", path)
+    except OSError as e:
+        print(f"[WARNING] No se pudo guardar el caché de la lista {list_id}: {e}")
+
+
+def _clear_cached_tasks(list_id):
+    """Borra la entrada de caché de la lista (por ejemplo, si está dañada)."""
+    try:
+        os.remove(_cache_path(list_id))
+    except OSError:
+        pass
+
+
+async def get_lists_from_folder(session, folder_id):
     """Obtiene todas las listas dentro de una carpeta."""
     print(f"[INFO] Obteniendo listas de la carpeta {folder_id}...")
     url = f"https://api.clickup.com/api/v2/folder/{folder_id}"
-    headers = {"Authorization": api_token}
 
-    # Intentar 3 veces con timeout creciente
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            timeout = 15 + (attempt * 5)  # 15s, 20s, 25s
-            print(f"[DEBUG] Intento {attempt + 1}/{max_retries} (timeout: {timeout}s)")
-
-            response = requests.get(url, headers=headers, timeout=timeout)
-
-            # Verificar el código de respuesta
-            if response.status_code == 404:
-                print(f"[ERROR] Folder ID '{folder_id}' no existe o no tienes acceso")
-                print(f"[AYUDA] Verifica el ID en la URL de ClickUp: /v/o/f/FOLDER_ID")
-                return None
-            elif response.status_code == 401:
-                print(f"[ERROR] Token de API inválido o sin permisos")
-                return None
-            elif response.status_code == 403:
-                print(f"[ERROR] Sin permisos para acceder a esta carpeta")
-                return None
-
-            response.raise_for_status()
-            folder_data = response.json()
-            lists = folder_data.get("lists", [])
-            print(f"[OK] Encontradas {len(lists)} listas en la carpeta")
-            return lists
-
-        except requests.exceptions.Timeout:
-            print(f"[WARNING] Timeout en intento {attempt + 1}")
-            if attempt == max_retries - 1:
-                print(f"[ERROR] Timeout después de {max_retries} intentos")
-                return None
-        except requests.exceptions.ConnectionError as e:
-            print(f"[WARNING] Error de conexión en intento {attempt + 1}: {e}")
-            if attempt == max_retries - 1:
-                print(f"[ERROR] No se pudo conectar después de {max_retries} intentos")
-                print(f"[AYUDA] Posibles causas:")
-                print(f"  1. El Folder ID es incorrecto")
-                print(f"  2. Problemas de red/firewall")
-                print(f"  3. La API de ClickUp está temporalmente no disponible")
-                return None
-        except requests.exceptions.RequestException as e:
+    try:
+        folder_data = await _request(session, "GET", url)
+    except aiohttp.ClientResponseError as e:
+        # Verificar el código de respuesta
+        if e.status == 404:
+            print(f"[ERROR] Folder ID '{folder_id}' no existe o no tienes acceso")
+            print(f"[AYUDA] Verifica el ID en la URL de ClickUp: /v/o/f/FOLDER_ID")
+        elif e.status == 401:
+            print(f"[ERROR] Token de API inválido o sin permisos")
+        elif e.status == 403:
+            print(f"[ERROR] Sin permisos para acceder a esta carpeta")
+        else:
             print(f"[ERROR] No se pudo obtener la carpeta: {e}")
-            return None
-
-    return None
+        return None
+    except asyncio.TimeoutError:
+        print(f"[ERROR] Timeout después de {MAX_RETRIES} intentos")
+        return None
+    except aiohttp.ClientConnectionError as e:
+        print(f"[ERROR] No se pudo conectar después de {MAX_RETRIES} intentos: {e}")
+        print(f"[AYUDA] Posibles causas:")
+        print(f"  1. El Folder ID es incorrecto")
+        print(f"  2. Problemas de red/firewall")
+        print(f"  3. La API de ClickUp está temporalmente no disponible")
+        return None
+    except (aiohttp.ClientError, orjson.JSONDecodeError) as e:
+        print(f"[ERROR] No se pudo obtener la carpeta: {e}")
+        return None
 
+    lists = folder_data.get("lists", [])
+    print(f"[OK] Encontradas {len(lists)} listas en la carpeta")
+    return lists
 
-def get_clickup_tasks(api_token, list_id):
-    """Obtiene tareas de una lista específica de ClickUp."""
-    url = f"https://api.clickup.com/api/v2/list/{list_id}/task"
-    headers = {"Authorization": api_token}
 
-    # Intentar 3 veces
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            timeout = 15 + (attempt * 5)
-            response = requests.get(
-                url,
-                headers=headers,
-                params={
-                    "archived": False,
-                    "include_closed": True,
-                },
-                timeout=timeout,
-            )
+async def get_clickup_tasks(session, list_id):
+    """
+    Obtiene tareas de una lista específica de ClickUp.
 
-            # Verificar errores específicos
-            if response.status_code == 404:
-                print(f"[ERROR] List ID '{list_id}' no existe o no tienes acceso")
-                return None
-            elif response.status_code == 401:
-                print(f"[ERROR] Token de API inválido")
-                return None
+    La respuesta se guarda en disco con su ETag; si ClickUp responde 304
+    (sin cambios) se reutiliza la copia local en lugar de descargarla.
+    """
+    url = f"https://api.clickup.com/api/v2/list/{list_id}/task"
+    params = {
+        "archived": "false",
+        "include_closed": "true",
+    }
+    cached_etag, cached_body = _load_cached_tasks(list_id)
 
-            response.raise_for_status()
-            tasks = response.json().get("tasks", [])
-            return tasks
-
-        except requests.exceptions.Timeout:
-            if attempt == max_retries - 1:
-                print(f"[ERROR] Timeout al obtener tareas de la lista {list_id}")
-                return None
-        except requests.exceptions.ConnectionError as e:
-            if attempt == max_retries - 1:
-                print(f"[ERROR] Error de conexión al obtener tareas: {e}")
-                return None
-        except requests.exceptions.RequestException as e:
+    try:
+        status, etag, body = await _conditional_get(
+            session, url, etag=cached_etag, params=params
+        )
+        if status == 304:
+            try:
+                tasks = orjson.loads(cached_body).get("tasks", [])
+            except orjson.JSONDecodeError:
+                # Copia local dañada: descartarla y pedir la lista completa
+                print(f"[WARNING] Caché de la lista {list_id} dañado, descargando")
+                _clear_cached_tasks(list_id)
+                status, etag, body = await _conditional_get(session, url, params=params)
+            else:
+                print(f"[INFO] Lista {list_id} sin cambios, usando caché local")
+                return tasks
+    except aiohttp.ClientResponseError as e:
+        # Verificar errores específicos
+        if e.status == 404:
+            print(f"[ERROR] List ID '{list_id}' no existe o no tienes acceso")
+        elif e.status == 401:
+            print(f"[ERROR] Token de API inválido")
+        else:
             print(f"[ERROR] {e}")
-            return None
+        return None
+    except asyncio.TimeoutError:
+        print(f"[ERROR] Timeout al obtener tareas de la lista {list_id}")
+        return None
+    except aiohttp.ClientConnectionError as e:
+        print(f"[ERROR] Error de conexión al obtener tareas: {e}")
+        return None
+    except aiohttp.ClientError as e:
+        print(f"[ERROR] {e}")
+        return None
 
-    return None
+    if etag:
+        _store_cached_tasks(list_id, etag, body)
+
+    try:
+        return orjson.loads(body).get("tasks", [])
+    except orjson.JSONDecodeError as e:
+        print(f"[ERROR] Respuesta no válida al obtener tareas: {e}")
+        return None
 
 
-def get_all_tasks_from_source(api_token, source_id, source_type="list"):
+async def get_all_tasks_from_source(session, source_id, source_type="list"):
     """
     Obtiene todas las tareas de una lista o carpeta.
 
+    Las listas de una carpeta se piden en paralelo sobre una misma sesión,
+    así el tiempo total es el de la lista más lenta y no la suma de todas.
+
     Args:
-        api_token: Token de API de ClickUp
+        session: Sesión aiohttp de ClickUp (con el token en los headers)
         source_id: ID de la lista o carpeta
         source_type: 'list' o 'folder'
     """
@@ -229,26 +429,30 @@ def get_all_tasks_from_source(api_token, source_id, source_type="list"):
 
     if source_type == "folder":
         print(f"[INFO] Obteniendo tareas de la carpeta {source_id}...")
-        lists = get_lists_from_folder(api_token, source_id)
+        lists = await get_lists_from_folder(session, source_id)
 
         if not lists:
             return None
 
         for list_item in lists:
-            list_id = list_item["id"]
-            list_name = list_item["name"]
-            print(f"  → Obteniendo tareas de lista: {list_name} (ID: {list_id})")
+            print(
+                f"  → Obteniendo tareas de lista: {list_item['name']} (ID: {list_item['id']})"
+            )
+
+        results = await asyncio.gather(
+            *[get_clickup_tasks(session, l["id"]) for l in lists]
+        )
 
-            tasks = get_clickup_tasks(api_token, list_id)
+        for list_item, tasks in zip(lists, results):
             if tasks:
                 all_tasks.extend(tasks)
-                print(f"    Obtenidas {len(tasks)} tareas")
+                print(f"    {list_item['name']}: obtenidas {len(tasks)} tareas")
 
         print(f"[OK] Total de tareas obtenidas: {len(all_tasks)}")
 
     else:  # source_type == "list"
         print(f"[INFO] Obteniendo tareas de la lista {source_id}...")
-        tasks = get_clickup_tasks(api_token, source_id)
+        tasks = await get_clickup_tasks(session, source_id)
         if tasks:
             all_tasks = tasks
             print(f"[OK] Obtenidas {len(all_tasks)} tareas")
@@ -257,131 +461,147 @@ def get_all_tasks_from_source(api_token, source_id, source_type="list"):
         return None
 
     # Debug: mostrar status de todas las tareas
-    status_counts = {}
-    for task in all_tasks:
-        status = task.get("status", {}).get("status", "Sin Status")
-        status_counts[status] = status_counts.get(status, 0) + 1
-    print(f"[DEBUG] Status encontrados: {status_counts}")
+    if log.isEnabledFor(logging.DEBUG):
+        status_counts = {}
+        for task in all_tasks:
+            status = task.get("status", {}).get("status", "Sin Status")
+            status_counts[status] = status_counts.get(status, 0) + 1
+        log.debug("Status encontrados: %s", status_counts)
 
     return all_tasks
 
 
-def clickup_timestamp_to_date(timestamp):
-    """Convierte timestamp de ClickUp a datetime."""
-    if not timestamp:
-        return None
-    try:
-        return datetime.fromtimestamp(int(timestamp) / 1000)
-    except:
-        return None
-
-
-def generate_gantt_image(tasks, project_name="ClickUp"):
-    """Genera imagen PNG del Gantt usando matplotlib."""
-    print("[INFO] Generando imagen del Gantt...")
-    print(f"[DEBUG] Total de tareas recibidas: {len(tasks)}")
-
-    # Filtrar tareas con fechas
-    valid_tasks = []
-    for task in tasks:
-        start_date = clickup_timestamp_to_date(task.get("start_date"))
-        due_date = clickup_timestamp_to_date(task.get("due_date"))
-
-        task_name = task.get("name", "Sin nombre")
-        status = task.get("status", {}).get("status", "Sin Status")
-        print(
-            f"[DEBUG] Tarea: {task_name[:30]} | Start: {start_date} | Due: {due_date} | Status: {status}"
-        )
-
-        if not start_date and not due_date:
-            print(f"  -> Descartada (sin fechas)")
-            continue
-
-        if not start_date and due_date:
-            start_date = due_date - timedelta(days=1)
-
-        if start_date and not due_date:
-            due_date = start_date + timedelta(days=1)
+def _utc_offset_ms(timestamps):
+    """
+    Desfase (ms) de la zona horaria del equipo en cada timestamp.
 
-        valid_tasks.append(
-            {"name": task_name, "start": start_date, "end": due_date, "status": status}
-        )
+    Se calcula por instante para respetar el horario de verano, una vez por
+    valor distinto.
+    """
+    unique, inverse = np.unique(timestamps, return_inverse=True)
+    offsets = np.array(
+        [
+            datetime.fromtimestamp(ms / 1000, timezone.utc).astimezone().utcoffset()
+            // timedelta(milliseconds=1)
+            for ms in unique.tolist()
+        ],
+        dtype=np.int64,
+    )
+    return offsets[inverse]
 
-    if not valid_tasks:
-        print("[ERROR] No hay tareas con fechas")
-        return None
 
-    print(f"[DEBUG] Tareas válidas para graficar: {len(valid_tasks)}")
+def _ms_to_datetime64(values):
+    """
+    Convierte timestamps en ms (NaN si faltan) a datetime64[ms] (NaT si faltan).
 
-    # Ordenar por fecha de inicio
-    valid_tasks.sort(key=lambda x: x["start"])
+    El resultado está en hora local del equipo, como datetime.fromtimestamp,
+    para que barras y ejes no se desplacen según la zona horaria.
+    """
+    result = np.full(values.shape, np.datetime64("NaT", "ms"))
+    present = ~np.isnan(values)
+    timestamps = values[present].astype(np.int64)
+    result[present] = (timestamps + _utc_offset_ms(timestamps)).astype("datetime64[ms]")
+    return result
 
-    # Calcular rango de fechas con margen
-    min_date = min(task["start"] for task in valid_tasks)
-    max_date = max(task["end"] for task in valid_tasks)
 
-    # Agregar margen de 7 días antes y después
-    date_margin = timedelta(days=7)
-    chart_start = min_date - date_margin
-    chart_end = max_date + date_margin
+def _timestamp_column(tasks, field):
+    """
+    Extrae un campo de fecha de ClickUp (ms como texto) de todas las tareas.
 
-    print(
-        f"[DEBUG] Rango de fechas: {chart_start.strftime('%Y-%m-%d')} a {chart_end.strftime('%Y-%m-%d')}"
+    Devuelve un array float64 con NaN donde la fecha falta o no es válida.
+    """
+    values = [task.get(field) or "nan" for task in tasks]
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        # Algún valor no numérico: convertir uno a uno descartando los inválidos
+        column = np.full(len(values), np.nan)
+        for idx, value in enumerate(values):
+            try:
+                column[idx] = float(value)
+            except (TypeError, ValueError):
+                pass
+        return column
+
+
+def status_color(status):
+    """Devuelve el color de la barra según el status de ClickUp."""
+    status = status.upper()
+    color = STATUS_LUT.get(status)
+    if color:
+        return color
+
+    # Status personalizados: gana la primera palabra clave de STATUS_COLORS
+    # contenida en el texto (no la que aparece antes en el status)
+    for key, color in STATUS_LUT.items():
+        if key in status:
+            return color
+    return DEFAULT_STATUS_COLOR
+
+
+def _bar_vertices(left, width, rows, height):
+    """Vértices (N, 4, 2) de las barras horizontales centradas en cada fila."""
+    right = left + width
+    bottom = rows - height / 2
+    top = rows + height / 2
+    return np.stack(
+        [
+            np.column_stack([left, bottom]),
+            np.column_stack([left, top]),
+            np.column_stack([right, top]),
+            np.column_stack([right, bottom]),
+        ],
+        axis=1,
     )
 
-    # Configurar colores estilo ClickUp
-    status_colors = {
-        "ACHIEVED": "#8dd879",
-        "COMPLETE": "#8dd879",
-        "COMPLETED": "#8dd879",
-        "APPROVED": "#8dd879",
-        "FINALIZED": "#8dd879",
-        "DONE": "#8dd879",
-        "CLOSED": "#8dd879",
-        "MONITORING": "#a8c5f0",
-        "IMPLEMENTING": "#a8c5f0",
-        "PROGRESS": "#a8c5f0",
-        "REVIEWING": "#a8c5f0",
-        "IN PROGRESS": "#a8c5f0",
-        "TODO": "#e0e0e0",
-        "TO DO": "#e0e0e0",
-        "OPEN": "#e0e0e0",
-        "DRAFTING": "#e0e0e0",
-        "NOT STARTED": "#e0e0e0",
-    }
 
-    # Crear figura más grande
-    fig, ax = plt.subplots(figsize=(18, max(6, len(valid_tasks) * 0.5)))
+def _render_gantt_page(valid_tasks, starts_num, ends_num, x_limits, title):
+    """
+    Dibuja una página del Gantt y la devuelve como PNG en memoria.
+
+    `valid_tasks` va ordenada por fecha de inicio y `starts_num`/`ends_num`
+    son sus fechas en unidades de matplotlib (días), en el mismo orden. El
+    rango del eje X (`x_limits`) es común a todas las páginas.
+    """
+    # Alto proporcional a las tareas; la paginación por MAX_TASKS_PER_IMAGE
+    # ya lo limita a MAX_FIGURE_HEIGHT. Constrained layout ajusta los
+    # márgenes al dibujar e incluye las etiquetas de tarea (texto sin clip a
+    # la izquierda de las barras), así que no se recortan en el borde
+    fig_height = max(6, len(valid_tasks) * ROW_HEIGHT)
+    fig = Figure(figsize=(18, fig_height), layout="constrained")
+    ax = fig.subplots()
     fig.patch.set_facecolor("white")
 
-    # Dibujar barras (invertir orden para que coincida con ClickUp)
-    for idx, task in enumerate(reversed(valid_tasks)):
-        start = task["start"]
-        end = task["end"]
-        duration = (end - start).days + 1
-
-        # Color según status
-        color = "#e0e0e0"  # Gris claro por defecto
-        for key, col in status_colors.items():
-            if key in task["status"].upper():
-                color = col
-                break
-
-        # Dibujar barra con bordes suaves
-        ax.barh(
-            idx,
-            duration,
-            left=mdates.date2num(start),
-            height=0.7,
-            color=color,
-            edgecolor="#333333",
-            linewidth=1,
-            alpha=0.9,
+    # Invertir orden para que coincida con ClickUp (fila 0 = última tarea)
+    rows_tasks = list(reversed(valid_tasks))
+
+    starts_num = starts_num[::-1]
+    ends_num = ends_num[::-1]
+    durations = np.floor(ends_num - starts_num) + 1
+
+    # Agrupar filas por color
+    rows_by_color = defaultdict(list)
+    for idx, task in enumerate(rows_tasks):
+        rows_by_color[task["color"]].append(idx)
+
+    # Dibujar barras con bordes suaves: una colección por color en lugar de
+    # un artista por tarea
+    for color, rows in rows_by_color.items():
+        rows = np.array(rows)
+        ax.add_collection(
+            PolyCollection(
+                _bar_vertices(starts_num[rows], durations[rows], rows, height=0.7),
+                facecolors=color,
+                edgecolors="#333333",
+                linewidths=1,
+                alpha=0.9,
+            )
         )
 
-        # Etiqueta de tarea a la izquierda (fuera de la barra)
+    # Etiqueta de tarea a la izquierda (fuera de la barra)
+    for idx, task in enumerate(rows_tasks):
         ax.text(
-            mdates.date2num(start) - 0.3,
+            starts_num[idx] - 0.3,
             idx,
             task["name"],
             ha="right",
@@ -391,12 +611,12 @@ def generate_gantt_image(tasks, project_name="ClickUp"):
         )
 
     # Establecer límites del eje X con margen
-    ax.set_xlim(mdates.date2num(chart_start), mdates.date2num(chart_end))
+    ax.set_xlim(*x_limits)
 
     # Configurar ejes con más detalle
     ax.xaxis.set_major_formatter(mdates.DateFormatter("%b %d"))
     ax.xaxis.set_major_locator(mdates.DayLocator(interval=2))
-    plt.xticks(rotation=0, ha="center", fontsize=9)
+    ax.tick_params(axis="x", labelrotation=0, labelsize=9)
 
     ax.set_yticks(range(len(valid_tasks)))
     ax.set_yticklabels([])
@@ -409,92 +629,239 @@ def generate_gantt_image(tasks, project_name="ClickUp"):
     ax.spines["right"].set_visible(False)
     ax.spines["left"].set_visible(False)
 
-    plt.title(
-        f"Diagrama de Gantt - {project_name}",
+    ax.set_title(
+        title,
         fontsize=14,
         fontweight="bold",
         pad=15,
         loc="center",
     )
-    plt.xlabel("")
-    plt.tight_layout()
+    ax.set_xlabel("")
 
-    # Guardar en memoria con mayor resolución
+    # Guardar en memoria; compresión PNG rápida, el tamaño ya no es crítico
     img_buffer = io.BytesIO()
-    plt.savefig(
-        img_buffer, format="png", dpi=200, bbox_inches="tight", facecolor="white"
+    fig.savefig(
+        img_buffer,
+        format="png",
+        dpi=150,
+        facecolor="white",
+        pil_kwargs={"optimize": False, "compress_level": 1},
     )
     img_buffer.seek(0)
-    plt.close()
-
-    print("[OK] Imagen generada")
     return img_buffer
 
 
-def upload_attachment_to_confluence(confluence_config, page_id, image_buffer, filename):
-    """Sube imagen como attachment a Confluence."""
-    print(f"[INFO] Subiendo imagen a Confluence (Page ID: {page_id})...")
+def generate_gantt_image(tasks, project_name="ClickUp"):
+    """
+    Genera las imágenes PNG del Gantt usando matplotlib.
+
+    Devuelve una lista de buffers: más de uno si hay más tareas de las que
+    caben en una imagen (MAX_TASKS_PER_IMAGE).
+
+    Usa la API orientada a objetos (sin pyplot ni estado global), así que
+    puede ejecutarse en un hilo aparte mientras se consulta Confluence.
+    """
+    print("[INFO] Generando imagen del Gantt...")
+    log.debug("Total de tareas recibidas: %d", len(tasks))
+
+    # Fechas en columnas (ms, NaN si faltan) para filtrar y ordenar en numpy
+    names = [task.get("name", "Sin nombre") for task in tasks]
+    statuses = [task.get("status", {}).get("status", "Sin Status") for task in tasks]
+    starts = _timestamp_column(tasks, "start_date")
+    dues = _timestamp_column(tasks, "due_date")
+    has_start = ~np.isnan(starts)
+    has_due = ~np.isnan(dues)
+
+    # Detalle por tarea: solo se recorre si el nivel DEBUG está activo
+    if log.isEnabledFor(logging.DEBUG):
+        debug_starts = _ms_to_datetime64(starts)
+        debug_dues = _ms_to_datetime64(dues)
+        for idx in range(len(tasks)):
+            log.debug(
+                "Tarea: %s | Start: %s | Due: %s | Status: %s",
+                names[idx][:30],
+                debug_starts[idx],
+                debug_dues[idx],
+                statuses[idx],
+            )
+            if not has_start[idx] and not has_due[idx]:
+                log.debug("  -> Descartada (sin fechas)")
+
+    # Filtrar tareas con fechas; si falta una, se asigna 1 día de duración
+    valid = has_start | has_due
+    if not valid.any():
+        print("[ERROR] No hay tareas con fechas")
+        return None
 
+    starts = np.where(has_start, starts, dues - DAY_MS)
+    dues = np.where(has_due, dues, starts + DAY_MS)
+    indices = np.flatnonzero(valid)
+    starts, dues = starts[valid], dues[valid]
+
+    log.debug("Tareas válidas para graficar: %d", len(indices))
+
+    # Ordenar por fecha de inicio (estable, como list.sort)
+    order = np.argsort(starts, kind="stable")
+    indices, starts, dues = indices[order], starts[order], dues[order]
+
+    # Color resuelto al filtrar, una vez por status distinto
+    status_colors = {status: status_color(status) for status in set(statuses)}
+    valid_tasks = [
+        {
+            "name": names[idx],
+            "status": statuses[idx],
+            "color": status_colors[statuses[idx]],
+        }
+        for idx in indices
+    ]
+    starts = _ms_to_datetime64(starts)
+    dues = _ms_to_datetime64(dues)
+
+    # Calcular rango de fechas con margen de 7 días antes y después
+    date_margin = np.timedelta64(7, "D")
+    chart_start = starts.min() - date_margin
+    chart_end = dues.max() + date_margin
+
+    log.debug(
+        "Rango de fechas: %s a %s",
+        np.datetime_as_string(chart_start, unit="D"),
+        np.datetime_as_string(chart_end, unit="D"),
+    )
+
+    # Fechas en unidades de matplotlib (días), convertidas una sola vez para
+    # todas las páginas; los límites del eje X salen de los mismos arrays
+    starts_num = mdates.date2num(starts)
+    ends_num = mdates.date2num(dues)
+    margin_days = date_margin / np.timedelta64(1, "D")
+    x_limits = (starts_num.min() - margin_days, ends_num.max() + margin_days)
+
+    # Paginar: cada imagen tiene como máximo MAX_TASKS_PER_IMAGE tareas
+    pages = range(0, len(valid_tasks), MAX_TASKS_PER_IMAGE)
+    images = []
+    for page_number, first in enumerate(pages, start=1):
+        last = first + MAX_TASKS_PER_IMAGE
+        title = f"Diagrama de Gantt - {project_name}"
+        if len(pages) > 1:
+            title += f" ({page_number}/{len(pages)})"
+        images.append(
+            _render_gantt_page(
+                valid_tasks[first:last],
+                starts_num[first:last],
+                ends_num[first:last],
+                x_limits,
+                title,
+            )
+        )
+
+    print(f"[OK] Imagen generada ({len(images)} página(s))")
+    return images
+
+
+async def fetch_existing_attachment(session, confluence_config, page_id, filename):
+    """Busca en la página el attachment con ese nombre; None si no existe."""
     url = f"{confluence_config['url']}/wiki/rest/api/content/{page_id}/child/attachment"
-    auth = (confluence_config["user"], confluence_config["api_token"])
 
-    # Verificar si ya existe el attachment
     try:
-        response = requests.get(url, auth=auth, timeout=10)
-        response.raise_for_status()
-        attachments = response.json().get("results", [])
-
-        # Eliminar attachment anterior si existe
-        for att in attachments:
-            if att["title"] == filename:
-                att_id = att["id"]
-                delete_url = (
-                    f"{confluence_config['url']}/wiki/rest/api/content/{att_id}"
-                )
-                requests.delete(delete_url, auth=auth, timeout=10)
-                print("[INFO] Attachment anterior eliminado")
-                break
-    except:
-        pass
+        attachments = (
+            await _request(
+                session,
+                "GET",
+                url,
+                params={"filename": filename, "expand": "metadata"},
+                timeout=aiohttp.ClientTimeout(total=10),
+            )
+        ).get("results", [])
+    except Exception:
+        return None
+
+    for att in attachments:
+        if att["title"] == filename:
+            return att
+    return None
+
+
+async def upload_attachment_to_confluence(
+    session, confluence_config, page_id, image_buffer, filename, existing=None
+):
+    """
+    Sube imagen como attachment a Confluence.
+
+    `existing` es el attachment anterior con el mismo nombre (ver
+    fetch_existing_attachment). El hash SHA-256 de la imagen se guarda en el
+    comentario del attachment; si el anterior ya tiene el mismo hash no se
+    vuelve a subir.
+    """
+    print(f"[INFO] Subiendo imagen a Confluence (Page ID: {page_id})...")
+
+    url = f"{confluence_config['url']}/wiki/rest/api/content/{page_id}/child/attachment"
+    # getbuffer() expone los bytes sin copiarlos (getvalue() duplicaría la imagen)
+    with image_buffer.getbuffer() as image_bytes:
+        comment = f"sha256:{hashlib.sha256(image_bytes).hexdigest()}"
+
+    # Eliminar attachment anterior si existe y cambió
+    if existing:
+        if existing.get("metadata", {}).get("comment") == comment:
+            print("[OK] La imagen no cambió, se mantiene el attachment")
+            return existing["id"]
 
-    # Subir nuevo attachment
-    files = {"file": (filename, image_buffer, "image/png")}
+        delete_url = f"{confluence_config['url']}/wiki/rest/api/content/{existing['id']}"
+        try:
+            await _request(
+                session,
+                "DELETE",
+                delete_url,
+                timeout=aiohttp.ClientTimeout(total=10),
+            )
+            print("[INFO] Attachment anterior eliminado")
+        except Exception:
+            pass
+
+    # Subir nuevo attachment: aiohttp envía el BytesIO por bloques de 64 KiB,
+    # sin armar el cuerpo multipart completo en memoria
+    form = aiohttp.FormData()
+    form.add_field("file", image_buffer, filename=filename, content_type="image/png")
+    form.add_field("comment", comment)
     headers = {"X-Atlassian-Token": "no-check"}
 
     try:
-        response = requests.post(
-            url, auth=auth, headers=headers, files=files, timeout=30
-        )
-        response.raise_for_status()
-        result = response.json()
+        async with session.post(
+            url, headers=headers, data=form, timeout=aiohttp.ClientTimeout(total=30)
+        ) as response:
+            response.raise_for_status()
+            result = orjson.loads(await response.read())
         print("[OK] Imagen subida")
         return result["results"][0]["id"]
-    except requests.exceptions.RequestException as e:
+    except (aiohttp.ClientError, asyncio.TimeoutError, orjson.JSONDecodeError) as e:
         print(f"[ERROR] {e}")
         return None
 
 
-def update_confluence_with_image(
-    confluence_config, page_id, attachment_id, filename, project_name
+async def update_confluence_with_image(
+    session, confluence_config, page_id, attachment_ids, filenames, project_name
 ):
-    """Actualiza página con la imagen."""
+    """Actualiza página con las imágenes (una por página del Gantt)."""
     print(f"[INFO] Actualizando página (Page ID: {page_id})...")
 
     # Obtener info de página
     url = f"{confluence_config['url']}/wiki/rest/api/content/{page_id}?expand=body.storage,version"
-    auth = (confluence_config["user"], confluence_config["api_token"])
 
     try:
-        response = requests.get(url, auth=auth, timeout=10)
-        response.raise_for_status()
-        page_info = response.json()
-    except:
+        page_info = await _request(
+            session, "GET", url, timeout=aiohttp.ClientTimeout(total=10)
+        )
+    except Exception:
         return False
 
     current_version = page_info["version"]["number"]
     page_title = page_info["title"]
     page_type = page_info["type"]
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    images = "\n".join(
+        f"""<ac:image ac:height="600">
+  <ri:attachment ri:filename="{filename}" />
+</ac:image>"""
+        for filename in filenames
+    )
 
     # Contenido con imagen
     page_content = f"""
@@ -502,9 +869,7 @@ def update_confluence_with_image(
 <p><em>Última actualización: {timestamp}</em></p>
 <p> </p>
 
-<ac:image ac:height="600">
-  <ri:attachment ri:filename="{filename}" />
-</ac:image>
+{images}
 
 <p> </p>
 <p><ac:structured-macro ac:name="info">
@@ -524,19 +889,24 @@ def update_confluence_with_image(
         "body": {"storage": {"value": page_content, "representation": "storage"}},
     }
 
+    # Un solo intento: la versión ya no sería la siguiente al reintentar
     try:
-        response = requests.put(
-            url, json=payload, headers=headers, auth=auth, timeout=10
+        await _request_once(
+            session,
+            "PUT",
+            url,
+            data=orjson.dumps(payload),
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=10),
         )
-        response.raise_for_status()
         print("[OK] Página actualizada")
         return True
-    except requests.exceptions.RequestException as e:
+    except (aiohttp.ClientError, asyncio.TimeoutError, orjson.JSONDecodeError) as e:
         print(f"[ERROR] {e}")
         return False
 
 
-def process_mapping(config, mapping):
+async def process_mapping(config, mapping, clickup_session, confluence_session):
     """Procesa un mapping individual (lista/carpeta → página)."""
     project_name = mapping.get("name", "ClickUp")
     page_id = mapping.get("confluence_page_id")
@@ -564,32 +934,67 @@ def process_mapping(config, mapping):
     print("=" * 70)
 
     # 1. Obtener tareas
-    tasks = get_all_tasks_from_source(
-        config["clickup"]["api_token"], source_id, source_type
-    )
+    tasks = await get_all_tasks_from_source(clickup_session, source_id, source_type)
     if not tasks:
         print(f"[ERROR] No se pudieron obtener tareas para {project_name}")
         return False
 
-    # 2. Generar imagen
-    image_buffer = generate_gantt_image(tasks, project_name)
-    if not image_buffer:
+    # 2. Generar imágenes (en un hilo) mientras se busca el attachment
+    # anterior de la primera página
+    file_prefix = f"gantt-{project_name.lower().replace(' ', '-')}-{datetime.now().strftime('%Y%m%d')}"
+    filenames = [f"{file_prefix}.png"]
+    images, first_attachment = await asyncio.gather(
+        asyncio.to_thread(generate_gantt_image, tasks, project_name),
+        fetch_existing_attachment(
+            confluence_session, config["confluence"], page_id, filenames[0]
+        ),
+    )
+    if not images:
         print(f"[ERROR] No se pudo generar imagen para {project_name}")
         return False
 
+    # Páginas adicionales del Gantt: gantt-...-2.png, gantt-...-3.png, ...
+    filenames += [f"{file_prefix}-{n}.png" for n in range(2, len(images) + 1)]
+    existing_attachments = [first_attachment] + list(
+        await asyncio.gather(
+            *[
+                fetch_existing_attachment(
+                    confluence_session, config["confluence"], page_id, filename
+                )
+                for filename in filenames[1:]
+            ]
+        )
+    )
+
     # 3. Subir a Confluence
-    filename = f"gantt-{project_name.lower().replace(' ', '-')}-{datetime.now().strftime('%Y%m%d')}.png"
-    attachment_id = upload_attachment_to_confluence(
-        config["confluence"], page_id, image_buffer, filename
+    attachment_ids = await asyncio.gather(
+        *[
+            upload_attachment_to_confluence(
+                confluence_session,
+                config["confluence"],
+                page_id,
+                image_buffer,
+                filename,
+                existing,
+            )
+            for image_buffer, filename, existing in zip(
+                images, filenames, existing_attachments
+            )
+        ]
     )
 
-    if not attachment_id:
+    if not all(attachment_ids):
         print(f"[ERROR] No se pudo subir imagen para {project_name}")
         return False
 
     # 4. Actualizar página
-    success = update_confluence_with_image(
-        config["confluence"], page_id, attachment_id, filename, project_name
+    success = await update_confluence_with_image(
+        confluence_session,
+        config["confluence"],
+        page_id,
+        attachment_ids,
+        filenames,
+        project_name,
     )
 
     if success:
@@ -601,7 +1006,52 @@ def process_mapping(config, mapping):
         return False
 
 
+async def _run_all(config):
+    """
+    Procesa todos los mappings en paralelo.
+
+    Se usa una sola sesión por host (ClickUp y Confluence) para reutilizar
+    las conexiones, y un semáforo para no saturar ninguna de las dos APIs.
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_PROJECTS)
+
+    clickup_session = aiohttp.ClientSession(
+        headers={"Authorization": config["clickup"]["api_token"]},
+        connector=aiohttp.TCPConnector(limit=CLICKUP_MAX_CONNECTIONS),
+    )
+    confluence_session = aiohttp.ClientSession(
+        headers={"Authorization": basic_auth_header(config["confluence"])},
+        connector=aiohttp.TCPConnector(limit=CONFLUENCE_MAX_CONNECTIONS),
+    )
+
+    async def run_mapping(mapping):
+        async with semaphore:
+            return await process_mapping(
+                config, mapping, clickup_session, confluence_session
+            )
+
+    async with clickup_session, confluence_session:
+        outcomes = await asyncio.gather(
+            *[run_mapping(mapping) for mapping in config["mappings"]],
+            return_exceptions=True,
+        )
+
+    results = []
+    for mapping, outcome in zip(config["mappings"], outcomes):
+        name = mapping.get("name", "Unknown")
+        if isinstance(outcome, Exception):
+            print(f"[ERROR] Fallo inesperado procesando {name}: {outcome!r}")
+            outcome = False
+        results.append({"name": name, "success": outcome})
+
+    return results
+
+
 if __name__ == "__main__":
+    # Mensajes de depuración del script con LOG_LEVEL=DEBUG (por defecto INFO)
+    logging.basicConfig(format="[%(levelname)s] %(message)s", stream=sys.stdout)
+    log.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
     print("=" * 70)
     print("ClickUp -> Gantt PNG en Confluence (Multi-Proyecto)")
     print("=" * 70)
@@ -618,11 +1068,8 @@ if __name__ == "__main__":
     print(f"[INFO] Se encontraron {len(config['mappings'])} proyectos para sincronizar")
     print()
 
-    # Procesar cada mapping
-    results = []
-    for mapping in config["mappings"]:
-        success = process_mapping(config, mapping)
-        results.append({"name": mapping.get("name", "Unknown"), "success": success})
+    # Procesar todos los mappings en paralelo
+    results = asyncio.run(_run_all(config))
 
     # Resumen final
     print("\n" + "=" * 70)